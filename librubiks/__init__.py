@@ -1,3 +1,4 @@
+import contextlib
 import functools
 import numpy as np
 import torch
@@ -20,3 +21,24 @@ def no_grad(fun):
 			return fun(*args, **kwargs)
 	return wrapper
 
+
+def inference_mode(fun):
+	# Like no_grad, but also skips the autograd version counter bookkeeping
+	# Only for functions whose outputs never enter autograd, e.g. searches and evaluations
+	# Falls back to no_grad on torch versions without torch.inference_mode
+	ctx = torch.inference_mode if hasattr(torch, "inference_mode") else torch.no_grad
+	functools.wraps(fun)
+	def wrapper(*args, **kwargs):
+		with ctx():
+			return fun(*args, **kwargs)
+	return wrapper
+
+
+def autocast():
+	# Context for inference forwards, which are run in bfloat16 on CUDA to halve the bytes moved
+	# and engage the tensor cores. Training stays in full precision
+	# A no-op on CPU and on torch versions without torch.autocast
+	if torch.cuda.is_available() and hasattr(torch, "autocast"):
+		return torch.autocast("cuda", dtype=torch.bfloat16)
+	return contextlib.nullcontext()
+
@@ -57,9 +57,11 @@ class TrainAnalysis:
 
 		self.substate_val_stds = list()
 
-		self.avg_value_targets = list()
-		self.param_changes = list()
-		self.param_total_changes = list()
+		# These are filled at every evaluation rollout, so they are preallocated to their final
+		# shapes and indexed by the evaluation number instead of growing python lists
+		self.avg_value_targets = np.empty((len(self.evaluations), depth))
+		self.param_changes = np.empty(len(self.evaluations))
+		self.param_total_changes = np.empty(len(self.evaluations))
 
 		self.policy_entropies = list()
 		self.rollout_policy = list()
@@ -85,17 +87,19 @@ class TrainAnalysis:
 
 		if rollout in self.evaluations:
 			net.eval()
+			eval_idx = int(np.searchsorted(self.evaluations, rollout))
 
 			# Calculating value targets
-			targets = value_targets.cpu().numpy().reshape((-1, self.depth))
-			self.avg_value_targets.append(targets.mean(axis=0))
+			# The mean over games is reduced before moving to host, so only depth values are copied out
+			targets = value_targets.view(-1, self.depth).mean(dim=0)
+			self.avg_value_targets[eval_idx] = targets.cpu().numpy()
 
 			# Calculating model change
 			model_change = torch.sqrt((net.get_params()-self.params)**2).mean().cpu()
 			model_total_change = torch.sqrt((net.get_params()-self.orig_params)**2).mean().cpu()
 			self.params = net.get_params()
-			self.param_changes.append(float(model_change))
-			self.param_total_changes.append(model_total_change)
+			self.param_changes[eval_idx] = float(model_change)
+			self.param_total_changes[eval_idx] = float(model_total_change)
 
 			#In the beginning: Calculate value given to first 12 substates
 			if rollout <= self.extra_evals:
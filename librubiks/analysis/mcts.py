@@ -1,3 +1,5 @@
+import matplotlib
+matplotlib.use("Agg")  # The figures are only saved, so the GUI backend is never needed
 import matplotlib.pyplot as plt
 
 import numpy as np
@@ -19,7 +21,7 @@ def solve(depth: int, c: float, time_limit: float):
 	state, f, d = cube.scramble(depth, True)
 	searcher = MCTS(net, c=c, search_graph=False)
 	is_solved = searcher.search(state, time_limit)
-	assert is_solved == (cube.get_solved().tostring() in searcher.indices)
+	assert is_solved == (cube.zobrist(cube.get_solved()) in searcher.indices)
 	return is_solved, len(searcher.indices)
 
 def analyze_var(var: str, values: np.ndarray, other_vars: dict):
@@ -54,7 +56,7 @@ def analyze_var(var: str, values: np.ndarray, other_vars: dict):
 	plt.grid(True)
 	plt.savefig(f"data/local_analyses/mcts_{var}.png")
 	# plt.show()
-	plt.clf()
+	plt.close(fig)  # close frees the figure instead of keeping it alive like clf
 
 def analyse_time_distribution(depth: int, c: float):
 	time_limits = np.linspace(.1, 2, 10)
@@ -78,7 +80,7 @@ def analyse_time_distribution(depth: int, c: float):
 	explore /= n
 	expand, explore = expand / (expand + explore), explore / (expand + explore)
 
-	plt.figure(figsize=(15, 10))
+	fig = plt.figure(figsize=(15, 10))
 	plt.plot(time_limits, expand*100, "o-", label="Time spent expanding")
 	plt.plot(time_limits, explore*100, "o-", label="Time spent exploring")
 	plt.legend(loc=2)
@@ -89,7 +91,7 @@ def analyse_time_distribution(depth: int, c: float):
 	plt.grid(True)
 	plt.savefig(f"data/local_analyses/mcts_time.png")
 	# plt.show()
-	plt.clf()
+	plt.close(fig)
 
 
 if __name__ == "__main__":
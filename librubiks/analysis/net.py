@@ -2,7 +2,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import torch
 
-from librubiks import gpu, no_grad
+from librubiks import gpu, inference_mode
 from librubiks import cube
 from librubiks.model import Model
 from librubiks.utils import TickTock, Logger
@@ -32,7 +32,7 @@ def _ff(oh_states, value=True, policy=True):
 			batches *= 2
 	return values
 
-@no_grad
+@inference_mode
 def value(n, d):
 	depths = np.tile(np.arange(1, d+1), n).reshape(n, d)
 	states, states_oh = cube.sequence_scrambler(n, d, False)
@@ -46,10 +46,12 @@ def rotate(state: np.ndarray, face: int, direction: int) -> np.ndarray:
 	method = _Cube2024.rotate if get_is2024() else _Cube686.rotate
 	return method(state, face, direction)
 
-def multi_rotate(states: np.ndarray, faces: np.ndarray, directions: np.ndarray) -> np.ndarray:
-	# Performs action (faces[i], directions[i]) on states[i]
+def multi_rotate(states: np.ndarray, faces: np.ndarray, directions: np.ndarray, repeats: int=1) -> np.ndarray:
+	# Performs action (faces[i], directions[i]) on states[i // repeats]
+	# With repeats > 1, each state is implicitly repeated `repeats` times by broadcasting
+	# instead of materializing the repeats times larger input array
 	method = _Cube2024.multi_rotate if get_is2024() else _Cube686.multi_rotate
-	return method(states, faces, directions)
+	return method(states, faces, directions, repeats)
 
 #################
 # Solving logic #
@@ -172,6 +174,60 @@ def stringify(state: np.ndarray) -> str:
 	string = "\n".join([" ".join(list(y)) for y in stringarr])
 	return string
 
+###################
+# Zobrist hashing #
+###################
+
+# One random bitstring per possible value of each entry in the state array
+# Generated with a private generator, such that the hashes are unaffected by reseeding elsewhere
+_zobrist_rng = np.random.RandomState(42)
+_zobrist2024 = _zobrist_rng.randint(0, 2**64, (20, 24), dtype=np.uint64)
+_zobrist686  = _zobrist_rng.randint(0, 2**64, (288, 2), dtype=np.uint64)
+
+def zobrist(state: np.ndarray) -> np.uint64:
+	"""
+	64 bit Zobrist hash of a state: The XOR of one random bitstring per entry value
+	A much cheaper transposition key than state.tostring(), as no bytes object is allocated
+	"""
+	return multi_zobrist(np.expand_dims(state, 0))[0]
+
+def multi_zobrist(states: np.ndarray) -> np.ndarray:
+	# Vectorized Zobrist hash of n states
+	if get_is2024():
+		keys = _zobrist2024[np.arange(20), states.reshape(len(states), 20)]
+	else:
+		keys = _zobrist686[np.arange(288), states.reshape(len(states), 288)]
+	return np.bitwise_xor.reduce(keys, axis=1)
+
+def rotate_with_hash(state: np.ndarray, key: np.uint64, face: int, direction: int) -> (np.ndarray, np.uint64):
+	"""
+	Performs one move on the cube and updates the Zobrist key of the state incrementally
+	Only the entries moved by the rotation are XOR'ed in and out instead of rehashing the full state
+	"""
+	states, keys = multi_rotate_with_hash(
+		np.expand_dims(state, 0),
+		np.array([key], dtype=np.uint64),
+		np.array([face]),
+		np.array([direction]),
+	)
+	return states[0], keys[0]
+
+def multi_rotate_with_hash(states: np.ndarray, keys: np.ndarray, faces: np.ndarray, directions: np.ndarray, repeats: int=1) -> (np.ndarray, np.ndarray):
+	"""
+	Like multi_rotate, but also returns the Zobrist keys of the new states
+	The keys are updated incrementally from those of the given states, touching only changed entries
+	With repeats > 1, state and key i are implicitly repeated over actions [i*repeats, (i+1)*repeats)
+	"""
+	new_states = multi_rotate(states, faces, directions, repeats)
+	table = _zobrist2024 if get_is2024() else _zobrist686
+	old_flat = states.reshape(len(states), -1)
+	new_flat = new_states.reshape(len(states), repeats, -1)
+	state_idcs, repeat_idcs, cols = np.where(old_flat[:, None, :] != new_flat)
+	rows = state_idcs * repeats + repeat_idcs
+	new_keys = np.repeat(keys, repeats) if repeats > 1 else keys.copy()
+	np.bitwise_xor.at(new_keys, rows, table[cols, old_flat[state_idcs, cols]] ^ table[cols, new_flat[state_idcs, repeat_idcs, cols]])
+	return new_states, new_keys
+
 ################
 # Action logic #
 ################
@@ -254,13 +310,15 @@ class _Cube2024:
 		return state
 
 	@classmethod
-	def multi_rotate(cls, states: np.ndarray, faces: np.ndarray, directions: np.ndarray):
-		# Performs action (faces[i], directions[i]) on states[i]
-		maps = cls.maps[directions, faces]
-		idcs = np.broadcast_to(np.arange(len(states)), (20, len(states))).T.ravel()
-		corners_sides = np.broadcast_to(cls.corner_side_idcs, (len(states), 20)).ravel()
-		states = states + maps[idcs, corners_sides, states.ravel()].reshape((len(states), 20))
-		return states
+	def multi_rotate(cls, states: np.ndarray, faces: np.ndarray, directions: np.ndarray, repeats: int=1):
+		# Performs action (faces[i], directions[i]) on states[i // repeats]
+		# The states are broadcast over the repeated actions, so no repeated input array is materialized
+		maps = cls.maps[directions, faces].reshape(len(states), repeats, *cls.maps.shape[2:])
+		state_idcs = np.arange(len(states))[:, None, None]
+		repeat_idcs = np.arange(repeats)[None, :, None]
+		expanded = states[:, None, :]
+		new_states = expanded + maps[state_idcs, repeat_idcs, cls.corner_side_idcs[None, None, :], expanded]
+		return new_states.reshape(len(states) * repeats, 20)
 
 	@classmethod
 	def as_oh(cls, states: np.ndarray):
@@ -347,10 +405,13 @@ class _Cube686:
 		return altered_state
 
 	@classmethod
-	def multi_rotate(cls, states: np.ndarray, faces: np.ndarray, directions: np.ndarray):
-		altered_states = states.copy()
-		ini_states = np.array([state[n] for state, n in zip(states, neighbors_686[faces])])
-		for altered_state, state, ini_state, face, direction in zip(altered_states, states, ini_states, faces, directions):
+	def multi_rotate(cls, states: np.ndarray, faces: np.ndarray, directions: np.ndarray, repeats: int=1):
+		# Performs action (faces[i], directions[i]) on states[i // repeats]
+		# The output allocation doubles as the repeated copy of the input, so no separate buffer is needed
+		altered_states = np.repeat(states, repeats, axis=0) if repeats > 1 else states.copy()
+		for i, (altered_state, face, direction) in enumerate(zip(altered_states, faces, directions)):
+			state = states[i // repeats]
+			ini_state = state[neighbors_686[face]]
 			if direction:
 				altered_state[face] = state[face, cls.roll_right]
 				altered_state[cls.neighbor_idcs_pos[face], cls.adjacents] = ini_state[_Cube686_n3_n13, cls.rolled_adjecents]
@@ -6,10 +6,50 @@ import torch
 
 from librubiks.utils import TickTock
 
-from librubiks import gpu, no_grad
+from librubiks import gpu, autocast, inference_mode
 from librubiks.model import Model
 from librubiks import cube
 
+try:
+	from numba import njit, prange
+	has_numba = True
+except ModuleNotFoundError:
+	has_numba = False
+
+if has_numba:
+	@njit(nogil=True, parallel=True)
+	def _multi_descend_jit(workers: int, c: float, nu: int, max_depth: int, neighbors: np.ndarray, leaves: np.ndarray,
+						   P: np.ndarray, N: np.ndarray, W: np.ndarray, L: np.ndarray, rev: np.ndarray):
+		# Performs `workers` PUCT descents concurrently with the GIL released and one thread per worker
+		# The virtual loss bumps on L spread the workers over different leaves
+		# They are racy between threads, but the loss is a search heuristic, and L is reset on backup anyway
+		action_dim = P.shape[1]
+		visited = np.zeros((workers, max_depth+1), dtype=np.int64)
+		actions = np.zeros((workers, max_depth), dtype=np.int64)
+		lengths = np.zeros(workers, dtype=np.int64)
+		for w in prange(workers):
+			cur = 1  # All descents start in the root
+			visited[w, 0] = cur
+			depth = 0
+			while not leaves[cur] and depth < max_depth:
+				nsum = 0.
+				for a in range(action_dim):
+					nsum += N[cur, a]
+				sqrtn = np.sqrt(nsum)
+				best, best_score = 0, -np.inf
+				for a in range(action_dim):
+					score = c * P[cur, a] * sqrtn / (1. + N[cur, a]) + W[cur, a] - L[cur, a]
+					if score > best_score:
+						best, best_score = a, score
+				L[cur, best] += nu
+				cur = int(neighbors[cur, best])
+				L[cur, rev[best]] += nu
+				actions[w, depth] = best
+				depth += 1
+				visited[w, depth] = cur
+			lengths[w] = depth
+		return visited, actions, lengths
+
 
 class Agent:
 	eps = np.finfo("float").eps
@@ -19,7 +59,7 @@ class Agent:
 		self.action_queue = deque()
 		self.tt = TickTock()
 
-	@no_grad
+	@inference_mode
 	def search(self, state: np.ndarray, time_limit: float=None, max_states: int=None) -> bool:
 		# Returns whether a path was found and generates action queue
 		# Implement _step method for agents that look one step ahead, otherwise overwrite this method
@@ -217,7 +257,7 @@ class AStar(DeepAgent):
 		self.lambda_ = lambda_
 		self.expansions = expansions
 
-	@no_grad
+	@inference_mode
 	def search(self, state: np.ndarray, time_limit: float=None, max_states: int=None) -> bool:
 		"""Seaches according to the batched, weighted A* algorithm
 
@@ -366,7 +406,7 @@ class AStar(DeepAgent):
 		self.parent_actions[shortcut_parents] = cube.rev_actions(actions_taken[shortcuts])
 		self.parents[shortcut_parents] = shortcut_states
 
-	@no_grad
+	@inference_mode
 	def cost(self, states: np .ndarray, indeces: np.ndarray) -> np.ndarray:
 		"""The A star cost of the state using the DNN heuristic
 		Uses the value neural network. -value is regarded as the distance heuristic
@@ -412,12 +452,88 @@ class AStar(DeepAgent):
 	def __str__(self) -> str:
 		return f'AStar (lambda={self.lambda_}, N={self.expansions})'
 
+class IndexTable:
+	"""
+	Open addressing hash table mapping Zobrist keys (uint64) to state indices
+	Replaces a python dict of state bytestrings on the search hot path: Lookups are linear probes
+	over a numpy array, and whole batches of keys are probed with vectorized operations
+	The value 0 marks an empty slot, mirroring that index 0 is unused in the searchers' state arrays
+	"""
+
+	def __init__(self, capacity: int=2**17):
+		self._capacity = capacity  # Must be a power of two, such that probing can use bitwise and
+		self._keys = np.zeros(self._capacity, dtype=np.uint64)
+		self._indices = np.zeros(self._capacity, dtype=int)
+		self._used = 0
+
+	def lookup(self, keys: np.ndarray) -> np.ndarray:
+		# Returns the stored index for every key with 0 where a key is absent
+		slots = (keys & np.uint64(self._capacity - 1)).astype(int)
+		indices = np.zeros(len(keys), dtype=int)
+		active = np.arange(len(keys))
+		while active.size:
+			slot_keys = self._keys[slots[active]]
+			found = (slot_keys == keys[active]) & (self._indices[slots[active]] != 0)
+			empty = self._indices[slots[active]] == 0
+			indices[active[found]] = self._indices[slots[active[found]]]
+			active = active[~(found | empty)]
+			slots[active] = (slots[active] + 1) & (self._capacity - 1)
+		return indices
+
+	def insert(self, keys: np.ndarray, indices: np.ndarray):
+		if (self._used + len(keys)) * 2 > self._capacity:
+			self._grow()
+		for key, index in zip(keys, indices):
+			slot = int(key) & (self._capacity - 1)
+			while self._indices[slot] and self._keys[slot] != key:
+				slot = (slot + 1) & (self._capacity - 1)
+			if not self._indices[slot]:
+				self._used += 1
+			self._keys[slot] = key
+			self._indices[slot] = index
+
+	def _grow(self):
+		# Doubles capacity and reinserts all entries, as their slots depend on the capacity
+		filled = self._indices != 0
+		keys, indices = self._keys[filled], self._indices[filled]
+		self._capacity *= 2
+		self._keys = np.zeros(self._capacity, dtype=np.uint64)
+		self._indices = np.zeros(self._capacity, dtype=int)
+		self._used = 0
+		self.insert(keys, indices)
+
+	def keys(self) -> np.ndarray:
+		return self._keys[self._indices != 0]
+
+	def values(self) -> np.ndarray:
+		return self._indices[self._indices != 0]
+
+	def items(self):
+		return zip(self.keys(), self.values())
+
+	def __contains__(self, key) -> bool:
+		return bool(self.lookup(np.array([key], dtype=np.uint64))[0])
+
+	def __getitem__(self, key) -> int:
+		index = self.lookup(np.array([key], dtype=np.uint64))[0]
+		if not index:
+			raise KeyError(key)
+		return index
+
+	def __setitem__(self, key, index: int):
+		self.insert(np.array([key], dtype=np.uint64), np.array([index]))
+
+	def __len__(self):
+		return self._used
+
+
 class MCTS(DeepAgent):
 
 	_expand_nodes = 1000  # Expands stack by 1000, then 2000, then 4000 and etc. each expansion
 	n_states = 0
-	indices = dict()  # Key is state.tostring(). Contains index of state in the next arrays. Index 0 is not used
+	indices: IndexTable  # Maps Zobrist keys of states to their index in the next arrays. Index 0 is not used
 	states: np.ndarray
+	hashes: np.ndarray  # Zobrist keys of the states, used for incremental hashing of their substates
 	neighbors: np.ndarray  # n x 12 array of neighbor indices. As first index is unused, np.all(self.neighbors, axis=1) can be used
 	leaves: np.ndarray  # Boolean vector containing whether a node is a leaf
 	P: np.ndarray
@@ -426,173 +542,292 @@ class MCTS(DeepAgent):
 	W: np.ndarray
 	L: np.ndarray
 
-	def __init__(self, net: Model, c: float, search_graph: bool):
+	_nn_cache: dict  # Transposition table mapping Zobrist keys to (P, V) from earlier forward passes of the current net
+
+	_ff_graph = None  # CUDA graph of the net forward pass, captured lazily when running on CUDA
+	_ff_static_in: torch.Tensor
+	_ff_static_p: torch.Tensor
+	_ff_static_v: torch.Tensor
+
+	def __init__(self, net: Model, c: float, search_graph: bool, workers: int=10):
 		super().__init__(net)
 		self.c = c
 		self.search_graph = search_graph
+		self.workers = workers
 		self.nu = 100
 
 		self.expand_nodes = 1000
 
+	@property
+	def net(self) -> Model:
+		return self._net
+
+	@net.setter
+	def net(self, net: Model):
+		# The cached evaluations and the captured graph follow the network, so both are invalidated whenever the network is changed
+		self._net = net
+		self._nn_cache = dict()
+		self._ff_graph = None
+
 	def reset(self, time_limit: float, max_states: int):
 		time_limit, max_states = super().reset(time_limit, max_states)
-		self.indices   = dict()
+		# The arrays are sized to the full search up front when a sensible max state count is given
+		# Otherwise they start small and double on demand like a C++ vector in increase_stack_size
+		self.expand_nodes = int(max_states) + self.workers * cube.action_dim if max_states <= 1e7 else 1000
+		self.indices   = IndexTable()
 		self.states    = np.empty((self.expand_nodes, *cube.shape()), dtype=cube.dtype)
-		self.neighbors = np.zeros((self.expand_nodes, cube.action_dim), dtype=int)
+		self.hashes    = np.zeros(self.expand_nodes, dtype=np.uint64)
+		self.neighbors = np.zeros((self.expand_nodes, cube.action_dim), dtype=np.uint32)
 		self.leaves    = np.ones(self.expand_nodes, dtype=bool)
-		self.P         = np.empty((self.expand_nodes, cube.action_dim))
-		self.V         = np.empty(self.expand_nodes)
-		self.N         = np.zeros((self.expand_nodes, cube.action_dim), dtype=int)
-		self.W         = np.zeros((self.expand_nodes, cube.action_dim))
-		self.L         = np.zeros((self.expand_nodes, cube.action_dim))
+		self.P         = np.empty((self.expand_nodes, cube.action_dim), dtype=np.float32)
+		self.V         = np.empty(self.expand_nodes, dtype=np.float32)
+		self.N         = np.zeros((self.expand_nodes, cube.action_dim), dtype=np.uint32)
+		self.W         = np.zeros((self.expand_nodes, cube.action_dim), dtype=np.float32)
+		self.L         = np.zeros((self.expand_nodes, cube.action_dim), dtype=np.float32)
 		return time_limit, max_states
 
 	def increase_stack_size(self):
 		expand_size    = len(self.states)
 		self.states	   = np.concatenate([self.states, np.empty((expand_size, *cube.shape()), dtype=cube.dtype)])
-		self.neighbors = np.concatenate([self.neighbors, np.zeros((expand_size, cube.action_dim), dtype=int)])
+		self.hashes    = np.concatenate([self.hashes, np.zeros(expand_size, dtype=np.uint64)])
+		self.neighbors = np.concatenate([self.neighbors, np.zeros((expand_size, cube.action_dim), dtype=np.uint32)])
 		self.leaves    = np.concatenate([self.leaves, np.ones(expand_size, dtype=bool)])
-		self.P         = np.concatenate([self.P, np.empty((expand_size, cube.action_dim))])
-		self.V         = np.concatenate([self.V, np.empty(expand_size)])
-		self.N         = np.concatenate([self.N, np.zeros((expand_size, cube.action_dim), dtype=int)])
-		self.W         = np.concatenate([self.W, np.zeros((expand_size, cube.action_dim))])
-		self.L         = np.concatenate([self.L, np.zeros((expand_size, cube.action_dim))])
+		self.P         = np.concatenate([self.P, np.empty((expand_size, cube.action_dim), dtype=np.float32)])
+		self.V         = np.concatenate([self.V, np.empty(expand_size, dtype=np.float32)])
+		self.N         = np.concatenate([self.N, np.zeros((expand_size, cube.action_dim), dtype=np.uint32)])
+		self.W         = np.concatenate([self.W, np.zeros((expand_size, cube.action_dim), dtype=np.float32)])
+		self.L         = np.concatenate([self.L, np.zeros((expand_size, cube.action_dim), dtype=np.float32)])
 
-	@no_grad
+	@inference_mode
 	def search(self, state: np.ndarray, time_limit: float=None, max_states: int=None) -> bool:
 		time_limit, max_states = self.reset(time_limit, max_states)
 		self.tt.tick()
 
-		self.indices[state.tostring()] = 1
+		root_key = cube.zobrist(state)
+		self.indices[root_key] = 1
 		self.states[1] = state
+		self.hashes[1] = root_key
 		if cube.is_solved(state): return True
 
 		oh = cube.as_oh(state)
-		p, v = self.net(oh)
+		p, v = self._feedforward(oh)
 		self.P[1] = p.softmax(dim=1).cpu().numpy()
 		self.V[1] = v.cpu().numpy()
-		indices_visited = [1]
-		actions_taken = []
-		while self.tt.tock() < time_limit and len(self) + cube.action_dim <= max_states:
+		paths = [([1], [])]
+		while self.tt.tock() < time_limit and len(self) + self.workers * cube.action_dim <= max_states:
 			self.tt.profile("Expanding leaves")
-			solve_leaf_index, solve_action = self.expand_leaf(indices_visited, actions_taken)
+			solve_leaf_index, solve_action, solve_actions = self.expand_leaves(paths)
 			self.tt.end_profile("Expanding leaves")
 
 			# If a solution is found
 			if solve_leaf_index != -1:
-				self.action_queue = deque(actions_taken) + deque([solve_action])
+				self.action_queue = deque(solve_actions) + deque([solve_action])
 				if self.search_graph:
 					self._complete_graph()
 					self._shorten_action_queue(solve_leaf_index)
 				return True
 
 			# Find leaves
-			indices_visited, actions_taken = self.find_leaf(time_limit)
+			paths = self.find_leaves(time_limit)
 
-		self.action_queue = deque(actions_taken)  # Generates a best guess action queue in case of no solution
+		self.action_queue = deque(paths[-1][1])  # Generates a best guess action queue in case of no solution
 
 		return False
 
-	def expand_leaf(self, visited_states_idcs: list, actions_taken: list) -> (int, int):
+	def expand_leaves(self, paths: list) -> (int, int, list):
 		"""
-		Expands around the given leaf and updates V and W in all visited_states_idcs
-		Returns the action taken to solve the cube. -1 if no solution is found
-		:param visited_states_idcs: List of states that have been visited including the starting node. Length n
-		:param actions_taken: List of actions taken from starting state. Length n-1
-		:return: The index of the leaf that is the solution and the action that must be taken from leaf_index.
-			Both are 0 if solution is not found
+		Expands around all unique leaves in paths and updates V and W along all paths
+		The policy and value evaluations of all new substates are batched into a single forward pass
+		:param paths: List of (indices_visited, actions_taken) pairs as returned by `find_leaves`
+		:return: The index of the leaf that is the solution, the action that must be taken from it,
+			and the actions that were taken to reach the leaf it was expanded from.
+			The first two are -1 if no solution is found
 		"""
-		if len(self) + cube.action_dim > len(self.states):
+		# Only expand each leaf once, even if multiple workers descended to it
+		leaves_idcs, expand_paths = [], []
+		for visited, actions in paths:
+			if visited[-1] not in leaves_idcs:
+				leaves_idcs.append(visited[-1])
+				expand_paths.append((visited, actions))
+
+		while len(self) + len(leaves_idcs) * cube.action_dim > len(self.states):
 			self.increase_stack_size()
 
-		leaf_index = visited_states_idcs[-1]
-		solve_leaf, solve_action = -1, -1
+		solve_leaf, solve_action, solve_actions = -1, -1, []
 
 		self.tt.profile("Get substates")
-		state = self.states[leaf_index]
-		substates = cube.multi_rotate(cube.repeat_state(state), *cube.iter_actions())
+		states = self.states[leaves_idcs]
+		# The substate keys are updated incrementally from the leaf keys instead of hashing from scratch
+		substates, substate_keys = cube.multi_rotate_with_hash(
+			states, self.hashes[leaves_idcs], *cube.iter_actions(len(leaves_idcs)), repeats=cube.action_dim
+		)
 		self.tt.end_profile("Get substates")
 
 		# Check what states have been seen already
-		substate_strs = [s.tostring() for s in substates]  # Unique identifier for each substate
-		get_substate_strs = lambda bools: [s for s, b in zip(substate_strs, bools) if b]  # Shitty way to easily index into list with boolean array
-		seen_substates = np.array([s in self.indices for s in substate_strs])  # States already in the graph
+		substate_idcs = self.indices.lookup(substate_keys)
+		seen_substates = substate_idcs != 0  # States already in the graph
 		unseen_substates = ~seen_substates  # States not already in the graph
+			# Handle duplicates between the expanded leaves
+		first_occurences = np.zeros(len(substate_keys), dtype=bool)
+		_, first_indeces = np.unique(substate_keys, return_index=True)
+		first_occurences[first_indeces] = True
+		unseen_substates &= first_occurences
 
 		self.tt.profile("Update indices and states")
-		new_states_idcs = len(self) + np.arange(unseen_substates.sum()) + 1
-		new_idcs_dict = { s: i for i, s in zip(new_states_idcs, get_substate_strs(unseen_substates)) }
-		self.indices.update(new_idcs_dict)
-		substate_idcs = np.array([self.indices[s] for s in substate_strs])
-		new_substate_idcs = substate_idcs[unseen_substates]
+		new_substate_idcs = len(self) + np.arange(unseen_substates.sum()) + 1
+		self.indices.insert(substate_keys[unseen_substates], new_substate_idcs)
+			# Duplicates of the new states now also resolve to an index
+		missing = substate_idcs == 0
+		substate_idcs[missing] = self.indices.lookup(substate_keys[missing])
 		new_substates = substates[unseen_substates]
 		self.states[new_substate_idcs] = new_substates
+		self.hashes[new_substate_idcs] = substate_keys[unseen_substates]
 		self.tt.end_profile("Update indices and states")
 
 		self.tt.profile("Update neigbors and leaf status")
-		actions = np.arange(cube.action_dim)
-		self.neighbors[leaf_index, actions] = substate_idcs
-		self.neighbors[substate_idcs, cube.rev_actions(actions)] = leaf_index
-		self.leaves[leaf_index] = False
+		actions_taken = np.tile(np.arange(cube.action_dim), len(leaves_idcs))
+		repeated_leaves_idcs = np.repeat(leaves_idcs, cube.action_dim)
+		self.neighbors[repeated_leaves_idcs, actions_taken] = substate_idcs
+		self.neighbors[substate_idcs, cube.rev_actions(actions_taken)] = repeated_leaves_idcs
+		self.leaves[leaves_idcs] = False
 		self.tt.end_profile("Update neigbors and leaf status")
 
 		self.tt.profile("Check for solution")
-		solved_substate = np.where(cube.multi_is_solved(substates))[0]
-		if solved_substate.size:
-			solve_leaf = substate_idcs[solved_substate[0]]
-			solve_action = solved_substate[0]
+		solved_substates = np.where(cube.multi_is_solved(substates))[0]
+		if solved_substates.size:
+			i = solved_substates[0]
+			solve_leaf = substate_idcs[i]
+			solve_action = actions_taken[i]
+			solve_actions = expand_paths[i // cube.action_dim][1]
 		self.tt.end_profile("Check for solution")
 
-		# Update policy, value, and W
-		self.tt.profile("One-hot encoding")
-		new_substates_oh = cube.as_oh(new_substates)
-		self.tt.end_profile("One-hot encoding")
-		self.tt.profile("Feedforward")
-		p, v = self.net(new_substates_oh)
-		p, v = p.cpu().softmax(dim=1).numpy(), v.cpu().numpy().squeeze()
-		self.tt.end_profile("Feedforward")
-
-		self.tt.profile("Update P, V, and W")
-		self.P[new_substate_idcs] = p
-		self.V[new_substate_idcs] = v
-
-		best_substate_v = v.max()
-		self.W[leaf_index] = self.V[self.neighbors[leaf_index]]
-		self.W[new_substate_idcs] = np.tile(v, (cube.action_dim, 1)).T
-		self.W[visited_states_idcs[:-1], actions_taken] = np.maximum(self.W[visited_states_idcs[:-1], actions_taken], best_substate_v)
-		self.tt.end_profile("Update P, V, and W")
-
-		# Update N and L
+		# Update policy, value, and W with a single forward pass for all new substates not found in the cache
+		if len(new_substates):
+			new_substate_keys = substate_keys[unseen_substates]
+			cached = np.array([k in self._nn_cache for k in new_substate_keys])
+			uncached = ~cached
+			p = np.empty((len(new_substates), cube.action_dim), dtype=np.float32)
+			v = np.empty(len(new_substates), dtype=np.float32)
+			if cached.any():
+				self.tt.profile("Cache lookup")
+				cached_p, cached_v = zip(*(self._nn_cache[k] for k, c in zip(new_substate_keys, cached) if c))
+				p[cached], v[cached] = np.array(cached_p), np.array(cached_v)
+				self.tt.end_profile("Cache lookup")
+			if uncached.any():
+				self.tt.profile("One-hot encoding")
+				new_substates_oh = cube.as_oh(new_substates[uncached])
+				self.tt.end_profile("One-hot encoding")
+				self.tt.profile("Feedforward")
+				p_new, v_new = self._feedforward(new_substates_oh)
+				p[uncached] = p_new.cpu().softmax(dim=1).numpy()
+				v[uncached] = v_new.cpu().numpy().squeeze(axis=1)
+				self.tt.end_profile("Feedforward")
+				self._nn_cache.update({ k: (p[i], v[i]) for i, k in enumerate(new_substate_keys) if uncached[i] })
+
+			self.tt.profile("Update P, V, and W")
+			self.P[new_substate_idcs] = p
+			self.V[new_substate_idcs] = v
+			self.W[new_substate_idcs] = np.tile(v, (cube.action_dim, 1)).T
+			self.tt.end_profile("Update P, V, and W")
+		self.W[leaves_idcs] = self.V[self.neighbors[leaves_idcs]]
+
+		# Update N, L, and W along all paths, including those that shared a leaf
 		self.tt.profile("Update N and L")
-		if actions_taken:  # Crashes if actions_taken is empty, which happens on the first run
-			self.N[visited_states_idcs[:-1], actions_taken] += 1
-			self.L[visited_states_idcs[:-1], actions_taken] = 0
-			self.L[visited_states_idcs[1:], cube.rev_actions(np.array(actions_taken))] = 0
+		for visited_states_idcs, actions_taken in paths:
+			best_substate_v = self.V[self.neighbors[visited_states_idcs[-1]]].max()
+			self.W[visited_states_idcs[:-1], actions_taken] = np.maximum(self.W[visited_states_idcs[:-1], actions_taken], best_substate_v)
+			if actions_taken:  # Crashes if actions_taken is empty, which happens on the first run
+				self.N[visited_states_idcs[:-1], actions_taken] += 1
+				self.L[visited_states_idcs[:-1], actions_taken] = 0
+				self.L[visited_states_idcs[1:], cube.rev_actions(np.array(actions_taken))] = 0
 		self.tt.end_profile("Update N and L")
 
-		return solve_leaf, solve_action
+		return solve_leaf, solve_action, solve_actions
 
-	def find_leaf(self, time_limit: float) -> (list, list):
+	def _feedforward(self, oh: torch.Tensor) -> (torch.Tensor, torch.Tensor):
+		"""
+		Evaluates a batch of one-hot states with the network
+		On CUDA, the forward pass is captured as a CUDA graph on first use, and later batches are copied
+		into the static input buffer and replayed, skipping the per-kernel launch overhead that
+		dominates at search-sized batches
+		Batches larger than the capture capacity fall back to a direct call
 		"""
-		Searches the tree starting from starting state
-		Returns a list of visited states (as indices for self.states) and a list of actions taken
+		if not torch.cuda.is_available() or not hasattr(torch.cuda, "CUDAGraph"):
+			with autocast():
+				p, v = self.net(oh)
+			return p.float(), v.float()
+		if self._ff_graph is None:
+			capacity = max(len(oh), self.workers * cube.action_dim)
+			self._ff_static_in = torch.zeros(capacity, oh.shape[1], device=gpu)
+			# The capture must be preceded by a warmup run on a side stream
+			stream = torch.cuda.Stream()
+			stream.wait_stream(torch.cuda.current_stream())
+			with torch.cuda.stream(stream), autocast():
+				self._net(self._ff_static_in)
+			torch.cuda.current_stream().wait_stream(stream)
+			self._ff_graph = torch.cuda.CUDAGraph()
+			with torch.cuda.graph(self._ff_graph), autocast():
+				self._ff_static_p, self._ff_static_v = self._net(self._ff_static_in)
+		if len(oh) > len(self._ff_static_in):
+			with autocast():
+				p, v = self.net(oh)
+			return p.float(), v.float()
+		self._ff_static_in[:len(oh)] = oh
+		self._ff_graph.replay()
+		return self._ff_static_p[:len(oh)].float(), self._ff_static_v[:len(oh)].float()
+
+	def find_leaves(self, time_limit: float) -> list:
 		"""
-		current_index = 1
-		indices_visited = [current_index]
-		actions_taken = []
+		Performs `self.workers` virtual loss descents from the root in lockstep
+		At every step, the PUCT scores of all unfinished descents are computed as a single
+		(workers, action_dim) numpy expression instead of one python loop per worker
+		Workers standing in the same node are assigned successive best actions, which is what the
+		virtual loss would enforce if the descents were performed sequentially
+		When numba is available, the descents instead run truly concurrently with the GIL released,
+		one thread per worker, bounded by a depth cap rather than the time limit
+		Returns a list of (indices_visited, actions_taken) pairs
+		"""
+		if has_numba:
+			self.tt.profile("Exploring next node")
+			visited, actions, lengths = _multi_descend_jit(
+				self.workers, self.c, self.nu, 10_000, self.neighbors, self.leaves,
+				self.P, self.N, self.W, self.L, cube.rev_actions(np.arange(cube.action_dim)),
+			)
+			paths = [
+				(visited[w, :lengths[w]+1].tolist(), actions[w, :lengths[w]].tolist())
+				for w in range(self.workers)
+			]
+			self.tt.end_profile("Exploring next node")
+			return paths
+		paths = [([1], []) for _ in range(self.workers)]
+		current = np.ones(self.workers, dtype=int)  # All descents start in the root
 		self.tt.profile("Exploring next node")
-		while not self.leaves[current_index] and self.tt.tock() < time_limit:
-			sqrtN = np.sqrt(self.N[current_index].sum())
-			U = self.c * self.P[current_index] * sqrtN / (1 + self.N[current_index])
-			Q = self.W[current_index] - self.L[current_index]
-			action = (U + Q).argmax()
-			self.L[current_index, action] += self.nu
-			current_index = self.neighbors[current_index, action]
-			self.L[current_index, cube.rev_action(action)] += self.nu
-			indices_visited.append(current_index)
-			actions_taken.append(action)
+		while self.tt.tock() < time_limit:
+			active = np.where(~self.leaves[current])[0]
+			if not active.size:
+				break
+			cur = current[active]
+			sqrtN = np.sqrt(self.N[cur].sum(axis=1))
+			U = self.c * self.P[cur] * sqrtN[:, None] / (1 + self.N[cur])
+			Q = self.W[cur] - self.L[cur]
+			scores = U + Q
+			actions = scores.argmax(axis=1)
+			# Spread workers standing in the same node over its best actions
+			nodes, inverse = np.unique(cur, return_inverse=True)
+			if len(nodes) < len(cur):
+				for g in range(len(nodes)):
+					members = np.where(inverse == g)[0]
+					if len(members) > 1:
+						ranked_actions = scores[members[0]].argsort()[::-1]
+						actions[members] = ranked_actions[np.arange(len(members)) % cube.action_dim]
+			next_states = current[active] = self.neighbors[cur, actions].astype(int)
+			np.add.at(self.L, (cur, actions), self.nu)
+			np.add.at(self.L, (next_states, cube.rev_actions(actions)), self.nu)
+			for worker, action, next_state in zip(active, actions, next_states):
+				paths[worker][0].append(next_state)
+				paths[worker][1].append(action)
 		self.tt.end_profile("Exploring next node")
-		return indices_visited, actions_taken
+		return paths
 
 	def _complete_graph(self):
 		"""
@@ -602,9 +837,10 @@ class MCTS(DeepAgent):
 		leaves_idcs = np.where(self.leaves[:len(self)+1])[0][1:]
 		actions_taken = np.tile(np.arange(cube.action_dim), len(leaves_idcs))
 		repeated_leaves_idcs = np.repeat(leaves_idcs, cube.action_dim)
-		substates = cube.multi_rotate(self.states[repeated_leaves_idcs], *cube.iter_actions(len(leaves_idcs)))
-		substate_strs = [s.tostring() for s in substates]
-		substate_idcs = np.array([self.indices[s] if s in self.indices else 0 for s in substate_strs])
+		substates, substate_keys = cube.multi_rotate_with_hash(
+			self.states[leaves_idcs], self.hashes[leaves_idcs], *cube.iter_actions(len(leaves_idcs)), repeats=cube.action_dim
+		)
+		substate_idcs = self.indices.lookup(substate_keys)  # 0 where a substate is not in the graph
 		self.neighbors[repeated_leaves_idcs, actions_taken] = substate_idcs
 		self.neighbors[substate_idcs, cube.rev_actions(actions_taken)] = repeated_leaves_idcs
 		self.neighbors[0] = 0
@@ -654,7 +890,7 @@ class EGVM(DeepAgent):
 		self.workers = workers
 		self.depth = depth
 
-	@no_grad
+	@inference_mode
 	def search(self, state: np.ndarray, time_limit: float=None, max_states: int=None) -> bool:
 		time_limit, max_states = self.reset(time_limit, max_states)
 		self.tt.tick()
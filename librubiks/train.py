@@ -4,7 +4,7 @@ import matplotlib.pyplot as plt
 import numpy as np
 import torch
 
-from librubiks import gpu, no_grad, reset_cuda, rc_params
+from librubiks import gpu, autocast, no_grad, reset_cuda, rc_params
 from librubiks.utils import Logger, NullLogger, unverbose, TickTock, TimeUnit, bernoulli_error
 
 from librubiks.analysis import TrainAnalysis
@@ -15,6 +15,42 @@ from librubiks.solving.agents import DeepAgent
 from librubiks.solving.evaluation import Evaluator
 plt.rcParams.update(rc_params)
 
+try:
+	from numba import njit, prange
+	has_numba = True
+except ModuleNotFoundError:
+	has_numba = False
+
+if has_numba:
+	@njit(parallel=True)
+	def _solved_masks_jit(first_flat: np.ndarray, second_flat: np.ndarray, solved_flat: np.ndarray) -> np.ndarray:
+		# A single fused early-exit pass over both flattened state arrays
+		# Avoids materializing the full boolean comparison tensors that the numpy reductions need
+		n, k = first_flat.shape
+		m = len(second_flat)
+		mask = np.empty(n + m, dtype=np.bool_)
+		for i in prange(n + m):
+			row = first_flat[i] if i < n else second_flat[i-n]
+			eq = True
+			for j in range(k):
+				if row[j] != solved_flat[j]:
+					eq = False
+					break
+			mask[i] = eq
+		return mask
+
+def _solved_masks(first_states: np.ndarray, second_states: np.ndarray) -> (np.ndarray, np.ndarray):
+	# Equivalent to cube.multi_is_solved on both arrays, but fused into one pass and
+	# JIT-compiled with numba when available
+	if not has_numba:
+		return cube.multi_is_solved(first_states), cube.multi_is_solved(second_states)
+	mask = _solved_masks_jit(
+		np.ascontiguousarray(first_states).reshape(len(first_states), -1),
+		np.ascontiguousarray(second_states).reshape(len(second_states), -1),
+		cube.get_solved_instance().ravel(),
+	)
+	return mask[:len(first_states)], mask[len(first_states):]
+
 class Train:
 
 	states_per_rollout: int
@@ -84,6 +120,14 @@ class Train:
 		self.policy_criterion = policy_criterion(reduction='none')
 		self.value_criterion = value_criterion(reduction='none')
 
+		# The two loss weight bases only depend on the rollout shape, so they are computed once here
+		# ADI_traindata only needs to blend them according to alpha
+		weighted = np.tile(1 / np.arange(1, self.rollout_depth+1), self.rollout_games)
+		unweighted = np.ones_like(weighted)
+		ws, us = weighted.sum(), len(unweighted)
+		self._weighted_loss_weights = torch.from_numpy(weighted / ws * (ws + us)).float().to(gpu)
+		self._uniform_loss_weights  = torch.from_numpy(unweighted / us * (ws + us)).float().to(gpu)
+
 		self.evaluator = evaluator
 		self.log = logger
 		self.log("\n".join([
@@ -145,6 +189,15 @@ class Train:
 		self.train_losses = np.empty(self.rollouts)
 		self.sol_percents = list()
 
+		# The targets are produced on the CPU with the same shape every rollout, so they are moved through
+		# pinned host buffers into persistent device buffers
+		# This makes the copies asynchronous and avoids a fresh device allocation per rollout
+		pin = torch.cuda.is_available()
+		host_policy_targets  = torch.empty(self.states_per_rollout, dtype=torch.long, pin_memory=pin)
+		host_value_targets   = torch.empty(self.states_per_rollout, pin_memory=pin)
+		device_policy_targets = torch.empty(self.states_per_rollout, dtype=torch.long, device=gpu)
+		device_value_targets  = torch.empty(self.states_per_rollout, device=gpu)
+
 		for rollout in range(self.rollouts):
 			reset_cuda()
 
@@ -154,8 +207,10 @@ class Train:
 			training_data, policy_targets, value_targets, loss_weights = self.ADI_traindata(generator_net, alpha)
 			self.tt.profile("To cuda")
 			training_data = training_data.to(gpu)
-			policy_targets = policy_targets.to(gpu)
-			value_targets = value_targets.to(gpu)
+			host_policy_targets.copy_(policy_targets)
+			policy_targets = device_policy_targets.copy_(host_policy_targets, non_blocking=True)
+			host_value_targets.copy_(value_targets)
+			value_targets = device_value_targets.copy_(host_value_targets, non_blocking=True)
 			loss_weights = loss_weights.to(gpu)
 			self.tt.end_profile("To cuda")
 			self.tt.end_profile("ADI training data")
@@ -165,6 +220,9 @@ class Train:
 			self.tt.profile("Training loop")
 			net.train()
 			batches = self._get_batches(self.states_per_rollout, self.batch_size)
+			# The losses are accumulated on the device, as reading them out every batch would synchronize the stream
+			policy_loss_acc = torch.zeros(1, device=gpu)
+			value_loss_acc  = torch.zeros(1, device=gpu)
 			for i, batch in enumerate(batches):
 				optimizer.zero_grad()
 				policy_pred, value_pred = net(training_data[batch], policy=True, value=True)
@@ -175,8 +233,8 @@ class Train:
 				loss = torch.mean(policy_loss + value_loss)
 				loss.backward()
 				optimizer.step()
-				self.policy_losses[rollout] += policy_loss.detach().cpu().numpy().mean() / len(batches)
-				self.value_losses[rollout] += value_loss.detach().cpu().numpy().mean() / len(batches)
+				policy_loss_acc += policy_loss.detach().mean()
+				value_loss_acc  += value_loss.detach().mean()
 
 				if self.with_analysis: #Save policy output to compute entropy
 					with torch.no_grad():
@@ -184,6 +242,9 @@ class Train:
 							torch.nn.functional.softmax(policy_pred.detach(), dim=0).cpu().numpy()
 						)
 
+			# A single transfer per rollout instead of two synchronizing transfers per batch
+			self.policy_losses[rollout] = policy_loss_acc.item() / len(batches)
+			self.value_losses[rollout] = value_loss_acc.item() / len(batches)
 			self.train_losses[rollout] = (self.policy_losses[rollout] + self.value_losses[rollout])
 			self.tt.end_profile("Training loop")
 
@@ -246,8 +307,7 @@ class Train:
 
 		return net, best_net
 
-	def _get_adi_ff_slices(self):
-		data_points = self.rollout_games * self.rollout_depth * cube.action_dim
+	def _get_adi_ff_slices(self, data_points: int):
 		slice_size = data_points // self.adi_ff_batches + 1
 		# Final slice may have overflow, however this is simply ignored when indexing
 		slices = [slice(i*slice_size, (i+1)*slice_size) for i in range(self.adi_ff_batches)]
@@ -277,19 +337,29 @@ class Train:
 		states, oh_states = cube.sequence_scrambler(self.rollout_games, self.rollout_depth, with_solved = self.reward_method == 'lapanfix')
 		self.tt.end_profile("Scrambling")
 
-		# Keeps track of solved states - Max Lapan's convergence fix
-		solved_scrambled_states = cube.multi_is_solved(states)
-
 		# Generates possible substates for all scrambled states. Shape: n_states*action_dim x *Cube_shape
+		# The substate keys are updated incrementally from the scrambled state keys and used for caching below
 		self.tt.profile("ADI substates")
-		substates = cube.multi_rotate(np.repeat(states, cube.action_dim, axis=0), *cube.iter_actions(len(states)))
+		state_keys = cube.multi_zobrist(states)
+		substates, substate_keys = cube.multi_rotate_with_hash(
+			states, state_keys, *cube.iter_actions(len(states)), repeats=cube.action_dim
+		)
 		self.tt.end_profile("ADI substates")
+		# The Rubik's graph has many transpositions, so each unique substate is only evaluated once
+		# The cache is rebuilt every rollout, as the generator network changes between them
+		self.tt.profile("Substate cache lookup")
+		# eval_idcs holds the first occurence of every unique key, and cache_idcs scatters the
+		# evaluations back to all substates
+		_, eval_idcs, cache_idcs = np.unique(substate_keys, return_index=True, return_inverse=True)
+		self.tt.end_profile("Substate cache lookup")
+
 		self.tt.profile("One-hot encoding")
-		substates_oh = cube.as_oh(substates)
+		substates_oh = cube.as_oh(substates[eval_idcs])
 		self.tt.end_profile("One-hot encoding")
 
 		self.tt.profile("Reward")
-		solved_substates = cube.multi_is_solved(substates)
+		# The scrambled state mask is kept for Max Lapan's convergence fix and scanned in the same pass as the substates
+		solved_scrambled_states, solved_substates = _solved_masks(states, substates)
 		# Reward for won state is 1 normally but 0 if running with reward0
 		rewards = (torch.zeros if self.reward_method == 'reward0' else torch.ones)\
 			(*solved_substates.shape)
@@ -300,8 +370,10 @@ class Train:
 		self.tt.profile("ADI feedforward")
 		while True:
 			try:
-				value_parts = [net(substates_oh[slice_], policy=False, value=True).squeeze() for slice_ in self._get_adi_ff_slices()]
-				values = torch.cat(value_parts).cpu()
+				# The target generation forwards run in reduced precision, while the training itself stays in full
+				with autocast():
+					value_parts = [net(substates_oh[slice_], policy=False, value=True).squeeze() for slice_ in self._get_adi_ff_slices(len(eval_idcs))]
+				values = torch.cat(value_parts).float().cpu()[cache_idcs]  # Scatter the unique evaluations back to all substates
 				break
 			except RuntimeError as e:  # Usually caused by running out of vram. If not, the error is still raised, else batch size is reduced
 				if "alloc" not in str(e):
@@ -311,32 +383,28 @@ class Train:
 		self.tt.end_profile("ADI feedforward")
 
 		self.tt.profile("Calculating targets")
-		values += rewards
-		values = values.reshape(-1, 12)
-		policy_targets = torch.argmax(values, dim=1)
-		value_targets = values[np.arange(len(values)), policy_targets]
+		values = (values + rewards).view(-1, cube.action_dim)
+		# max returns both the best value and its action, fusing argmax and gather into one kernel
+		value_targets, policy_targets = values.max(dim=1)
 		if self.reward_method == 'lapanfix':
 			# Trains on goal state, sets goalstate to 0
-			value_targets[solved_scrambled_states] = 0
+			value_targets = value_targets.masked_fill(torch.from_numpy(solved_scrambled_states), 0)
 		elif self.reward_method == 'schultzfix':
 			# Does not train on goal state, but sets first 12 substates to 0
 			first_substates = np.zeros(len(states), dtype=bool)
 			first_substates[np.arange(0, len(states), self.rollout_depth)] = True
-			value_targets[first_substates] = 0
+			value_targets = value_targets.masked_fill(torch.from_numpy(first_substates), 0)
 
 		self.tt.end_profile("Calculating targets")
 
-		# Weighting examples according to alpha
-		weighted = np.tile(1 / np.arange(1, self.rollout_depth+1), self.rollout_games)
-		unweighted = np.ones_like(weighted)
-		ws, us = weighted.sum(), len(unweighted)
-		loss_weights = ((1-alpha) * weighted / ws + alpha * unweighted / us) * (ws + us)
+		# Weighting examples according to alpha using the bases precomputed in __init__
+		loss_weights = (1-alpha) * self._weighted_loss_weights + alpha * self._uniform_loss_weights
 
 		if self.with_analysis:
 			self.tt.profile("ADI analysis")
 			self.analysis.ADI(values)
 			self.tt.end_profile("ADI analysis")
-		return oh_states, policy_targets, value_targets, torch.from_numpy(loss_weights).float()
+		return oh_states, policy_targets, value_targets, loss_weights
 
 	def _update_gen_net(self, generator_net: Model, net: Model):
 		"""Create a network with parameters weighted by self.tau"""
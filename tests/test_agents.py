@@ -51,9 +51,9 @@ class TestMCTS(MainTest):
 		solved = agent.search(state, .2)
 
 		# Indices
-		assert agent.indices[state.tostring()] == 1
-		for s, i in agent.indices.items():
-			assert agent.states[i].tostring() == s
+		assert agent.indices[cube.zobrist(state)] == 1
+		for key, i in agent.indices.items():
+			assert cube.zobrist(agent.states[i]) == key
 		assert sorted(agent.indices.values())[0] == 1
 		assert np.all(np.diff(sorted(agent.indices.values())) == 1)
 
@@ -63,8 +63,8 @@ class TestMCTS(MainTest):
 		assert np.all(agent.states[1] == state)
 		for i, s in enumerate(agent.states):
 			if i not in used_idcs: continue
-			assert s.tostring() in agent.indices
-			assert agent.indices[s.tostring()] == i
+			assert cube.zobrist(s) in agent.indices
+			assert agent.indices[cube.zobrist(s)] == i
 
 		# Neighbors
 		if not search_graph:
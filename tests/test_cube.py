@@ -99,6 +99,11 @@ class TestRubiksCube(MainTest):
 			states_classic = np.array([cube.rotate(state, face, d) for state, face, d in zip(states, faces, dirs)])
 			states = cube.multi_rotate(states, faces, dirs)
 			assert (states_classic == states).all()
+		# The implicit repeat matches an explicit np.repeat of the input states
+		faces, dirs = cube.iter_actions(len(states))
+		explicit = cube.multi_rotate(np.repeat(states, cube.action_dim, axis=0), faces, dirs)
+		implicit = cube.multi_rotate(states, faces, dirs, repeats=cube.action_dim)
+		assert (explicit == implicit).all()
 
 	def test_scramble(self):
 		np.random.seed(42)
@@ -113,6 +118,33 @@ class TestRubiksCube(MainTest):
 			state = cube.rotate(state, *(f, d))
 		assert cube.is_solved(state)
 
+	def test_zobrist(self):
+		self.is2024 = True
+		self._zobrist_test()
+		self.is2024 = False
+		self._zobrist_test()
+
+	@with_used_repr
+	def _zobrist_test(self):
+		states, _ = cube.sequence_scrambler(5, 10, False)
+		keys = cube.multi_zobrist(states)
+		assert keys.dtype == np.uint64
+		for state, key in zip(states, keys):
+			assert cube.zobrist(state) == key
+		# The hash depends only on the state and not on the path taken to it
+		state = cube.rotate(cube.rotate(cube.get_solved(), 0, 1), 0, 0)
+		assert cube.zobrist(state) == cube.zobrist(cube.get_solved())
+		assert cube.zobrist(cube.rotate(state, 1, 1)) != cube.zobrist(state)
+		# Incremental updates match full rehashes
+		faces, dirs = np.random.randint(0, 6, len(states)), np.random.randint(0, 2, len(states))
+		new_states, new_keys = cube.multi_rotate_with_hash(states, keys, faces, dirs)
+		assert np.all(new_keys == cube.multi_zobrist(new_states))
+		new_state, new_key = cube.rotate_with_hash(states[0], keys[0], 3, 0)
+		assert new_key == cube.zobrist(new_state)
+		# Also when the states are implicitly repeated over all actions
+		substates, substate_keys = cube.multi_rotate_with_hash(states, keys, *cube.iter_actions(len(states)), repeats=cube.action_dim)
+		assert np.all(substate_keys == cube.multi_zobrist(substates))
+
 	def test_iter_actions(self):
 		actions = np.array([
 			[0, 0, 1, 1, 2, 2, 3, 3, 4, 4, 5, 5] * 2,